@@ -3,18 +3,115 @@
 Brave Search MCP Server (STDIO) - Per-user API key support
 """
 
-import os
-import urllib.request
-import urllib.parse
+import asyncio
 import json
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Optional
+import httpx
 from fastmcp import FastMCP
 
-mcp = FastMCP("Brave Search")
+# Prefer orjson for faster response parsing
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
 
 BRAVE_API_KEY = os.environ.get("BRAVE_API_KEY", "")
 
+# Response cache settings
+CACHE_TTL = 600  # Seconds a cached result stays valid
+CACHE_MAXSIZE = 512  # Oldest entries are evicted beyond this
+
+# Brave free plan allows 1 request per second
+RATE_LIMIT = 1  # Requests per RATE_WINDOW
+RATE_WINDOW = 1.0  # Seconds
+
+_cache: OrderedDict = OrderedDict()
+_request_times: deque = deque()
+_rate_lock = asyncio.Lock()
+
+# Shared HTTP client, opened for the lifetime of the server
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _new_client() -> httpx.AsyncClient:
+    """Create an HTTP client carrying the Brave auth headers"""
+    return httpx.AsyncClient(
+        timeout=30,
+        headers={"Accept": "application/json", "X-Subscription-Token": BRAVE_API_KEY},
+        # Chat-paced searches arrive seconds apart, so keep idle connections
+        # alive well past httpx's 5s default to skip the TLS handshake
+        limits=httpx.Limits(max_connections=16, max_keepalive_connections=4, keepalive_expiry=60),
+    )
+
+
+@asynccontextmanager
+async def lifespan(server):
+    """Keep one HTTP client open so searches reuse connections"""
+    global _client
+    async with _new_client() as client:
+        _client = client
+        try:
+            yield
+        finally:
+            _client = None
+
+
+mcp = FastMCP("Brave Search", lifespan=lifespan)
+
+
+def _cache_get(key: tuple) -> Optional[str]:
+    """Return a cached result if it has not expired"""
+    hit = _cache.get(key)
+    if hit is None:
+        return None
+    stored_at, value = hit
+    if time.monotonic() - stored_at > CACHE_TTL:
+        del _cache[key]
+        return None
+    _cache.move_to_end(key)
+    return value
+
+
+def _cache_put(key: tuple, value: str):
+    """Store a result, evicting the least recently used entries"""
+    _cache[key] = (time.monotonic(), value)
+    _cache.move_to_end(key)
+    while len(_cache) > CACHE_MAXSIZE:
+        _cache.popitem(last=False)
+
+
+async def _throttle():
+    """Wait until another request fits in the sliding rate-limit window"""
+    async with _rate_lock:
+        now = time.monotonic()
+        while _request_times and now - _request_times[0] >= RATE_WINDOW:
+            _request_times.popleft()
+        if len(_request_times) >= RATE_LIMIT:
+            await asyncio.sleep(RATE_WINDOW - (now - _request_times[0]))
+            _request_times.popleft()
+        _request_times.append(time.monotonic())
+
+
+async def _get_json(url: str, query: str, count: int) -> dict:
+    """Call a Brave endpoint and return the decoded JSON body"""
+    await _throttle()
+    params = {"q": query, "count": min(count, 20)}
+    if _client is not None:
+        r = await _client.get(url, params=params)
+    else:
+        async with _new_client() as client:
+            r = await client.get(url, params=params)
+    r.raise_for_status()
+    return json_loads(r.content)
+
+
 @mcp.tool()
-def brave_web_search(query: str, count: int = 10) -> str:
+async def brave_web_search(query: str, count: int = 10) -> str:
     """
     Search the web using Brave Search API.
     
@@ -25,16 +122,13 @@ def brave_web_search(query: str, count: int = 10) -> str:
     if not BRAVE_API_KEY:
         return "Error: BRAVE_API_KEY not configured"
     
+    cache_key = ("web", query.lower().strip(), count)
+    cached = _cache_get(cache_key)
+    if cached is not None:
+        return cached
+    
     try:
-        encoded_query = urllib.parse.quote(query)
-        url = f"https://api.search.brave.com/res/v1/web/search?q={encoded_query}&count={min(count, 20)}"
-        
-        req = urllib.request.Request(url)
-        req.add_header("Accept", "application/json")
-        req.add_header("X-Subscription-Token", BRAVE_API_KEY)
-        
-        with urllib.request.urlopen(req, timeout=30) as response:
-            data = json.loads(response.read().decode())
+        data = await _get_json("https://api.search.brave.com/res/v1/web/search", query, count)
         
         results = []
         web_results = data.get("web", {}).get("results", [])
@@ -48,15 +142,17 @@ def brave_web_search(query: str, count: int = 10) -> str:
         if not results:
             return f"No results found for: {query}"
         
-        return "\n---\n".join(results)
+        result = "\n---\n".join(results)
+        _cache_put(cache_key, result)
+        return result
     
-    except urllib.error.HTTPError as e:
-        return f"API Error: {e.code} - {e.reason}"
+    except httpx.HTTPStatusError as e:
+        return f"API Error: {e.response.status_code} - {e.response.reason_phrase}"
     except Exception as e:
         return f"Error: {str(e)}"
 
 @mcp.tool()
-def brave_news_search(query: str, count: int = 10) -> str:
+async def brave_news_search(query: str, count: int = 10) -> str:
     """
     Search news using Brave Search API.
     
@@ -67,16 +163,13 @@ def brave_news_search(query: str, count: int = 10) -> str:
     if not BRAVE_API_KEY:
         return "Error: BRAVE_API_KEY not configured"
     
+    cache_key = ("news", query.lower().strip(), count)
+    cached = _cache_get(cache_key)
+    if cached is not None:
+        return cached
+    
     try:
-        encoded_query = urllib.parse.quote(query)
-        url = f"https://api.search.brave.com/res/v1/news/search?q={encoded_query}&count={min(count, 20)}"
-        
-        req = urllib.request.Request(url)
-        req.add_header("Accept", "application/json")
-        req.add_header("X-Subscription-Token", BRAVE_API_KEY)
-        
-        with urllib.request.urlopen(req, timeout=30) as response:
-            data = json.loads(response.read().decode())
+        data = await _get_json("https://api.search.brave.com/res/v1/news/search", query, count)
         
         results = []
         news_results = data.get("results", [])
@@ -91,10 +184,12 @@ def brave_news_search(query: str, count: int = 10) -> str:
         if not results:
             return f"No news found for: {query}"
         
-        return "\n---\n".join(results)
+        result = "\n---\n".join(results)
+        _cache_put(cache_key, result)
+        return result
     
-    except urllib.error.HTTPError as e:
-        return f"API Error: {e.code} - {e.reason}"
+    except httpx.HTTPStatusError as e:
+        return f"API Error: {e.response.status_code} - {e.response.reason_phrase}"
     except Exception as e:
         return f"Error: {str(e)}"
 
@@ -3,22 +3,38 @@
 Simple Knowledge Base MCP Server - Keyword Search
 Lightweight document search without RAG/ChromaDB
 """
+import asyncio
+import functools
 import os
 import sys
 import re
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 from fastmcp import FastMCP
 
-# Check for optional dependencies
-try:
-    import fitz  # PyMuPDF
-except ImportError:
-    fitz = None
+# Optional dependencies are imported on first use to keep startup fast
+@functools.lru_cache(maxsize=1)
+def _fitz():
+    """Return the PyMuPDF module, or None if it is not installed"""
+    try:
+        import fitz  # PyMuPDF
+    except ImportError:
+        return None
+    return fitz
+
+@functools.lru_cache(maxsize=1)
+def _docx_document():
+    """Return python-docx's Document class, or None if it is not installed"""
+    try:
+        from docx import Document as DocxDocument
+    except ImportError:
+        return None
+    return DocxDocument
 
-try:
-    from docx import Document as DocxDocument
-except ImportError:
-    DocxDocument = None
+# PyMuPDF does not support multithreading, so only one thread may use it at a time
+_FITZ_LOCK = threading.Lock()
 
 # Initialize FastMCP
 mcp = FastMCP("Knowledge Base")
@@ -33,6 +49,8 @@ for i, arg in enumerate(sys.argv):
 # Paths
 BASE_DIR = os.path.dirname(__file__)
 DOCUMENTS_DIR = os.path.join(BASE_DIR, "documents")
+# Extracted text cache, kept outside the user folders the admin panel lists
+CACHE_DIR = os.path.join(DOCUMENTS_DIR, ".cache")
 
 def get_user_docs_dir():
     """Get user's document directory"""
@@ -42,30 +60,40 @@ def get_user_docs_dir():
     os.makedirs(user_dir, exist_ok=True)
     return user_dir
 
-def extract_text_from_pdf(filepath: str) -> str:
-    """Extract text from PDF file"""
-    if fitz is None:
-        return "[PDF support not available. Install: pip install pymupdf]"
+def iter_pdf_text(filepath: str):
+    """Yield the text of each PDF page in order"""
+    doc = _fitz().open(filepath)
     try:
-        doc = fitz.open(filepath)
-        text = ""
         for page in doc:
-            text += page.get_text()
+            yield page.get_text()
+    finally:
         doc.close()
-        return text
+
+class ExtractionError(Exception):
+    """A document's text could not be extracted; the message is shown to the user"""
+
+def extract_text_from_pdf(filepath: str) -> str:
+    """Extract text from PDF file"""
+    if _fitz() is None:
+        raise ExtractionError("[PDF support not available. Install: pip install pymupdf]")
+    try:
+        # Tools run extraction on worker threads, so serialize every fitz use
+        with _FITZ_LOCK:
+            return "\n".join(iter_pdf_text(filepath))
     except Exception as e:
-        return f"[Error reading PDF: {e}]"
+        raise ExtractionError(f"[Error reading PDF: {e}]") from e
 
 def extract_text_from_docx(filepath: str) -> str:
     """Extract text from DOCX file"""
+    DocxDocument = _docx_document()
     if DocxDocument is None:
-        return "[DOCX support not available. Install: pip install python-docx]"
+        raise ExtractionError("[DOCX support not available. Install: pip install python-docx]")
     try:
         doc = DocxDocument(filepath)
-        text = "\n".join([para.text for para in doc.paragraphs])
+        text = "\n".join(para.text for para in doc.paragraphs)
         return text
     except Exception as e:
-        return f"[Error reading DOCX: {e}]"
+        raise ExtractionError(f"[Error reading DOCX: {e}]") from e
 
 def extract_text_from_txt(filepath: str) -> str:
     """Extract text from TXT file"""
@@ -73,43 +101,136 @@ def extract_text_from_txt(filepath: str) -> str:
         with open(filepath, 'r', encoding='utf-8') as f:
             return f.read()
     except Exception as e:
-        return f"[Error reading TXT: {e}]"
+        raise ExtractionError(f"[Error reading TXT: {e}]") from e
+
+def get_cache_path(filepath: str) -> str:
+    """Get the cached-text path for a user's document"""
+    return os.path.join(CACHE_DIR, USER_ID, os.path.basename(filepath) + ".txt")
+
+def get_cache_key(st: os.stat_result) -> str:
+    """Identify a document version by inode, size, ctime and mtime"""
+    # ctime cannot be set by os.utime and changes on every write or replace, so
+    # a new upload is a miss even if its size matches and its mtime was preserved
+    return f"{st.st_ino} {st.st_size} {st.st_ctime_ns} {st.st_mtime_ns}"
+
+def read_cached_text(filepath: str) -> Optional[str]:
+    """Return cached text if it was extracted from the document's current version"""
+    try:
+        key = get_cache_key(os.stat(filepath))
+        with open(get_cache_path(filepath), 'r', encoding='utf-8') as f:
+            if f.readline().rstrip("\n") != key:
+                return None
+            return f.read()
+    except OSError:
+        return None
+
+def write_cached_text(filepath: str, text: str, st: os.stat_result):
+    """Atomically store extracted text, keyed by the document stat taken before extraction"""
+    cache_path = get_cache_path(filepath)
+    cache_dir = os.path.dirname(cache_path)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(get_cache_key(st) + "\n")
+                f.write(text)
+            os.replace(tmp_path, cache_path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+    except Exception as e:
+        print(f"Cache write error: {e}", file=sys.stderr)
+
+def prune_cached_texts(filepaths: list):
+    """Remove cached text whose document is no longer among filepaths"""
+    keep = {os.path.basename(filepath) + ".txt" for filepath in filepaths}
+    try:
+        with os.scandir(os.path.join(CACHE_DIR, USER_ID)) as it:
+            stale = [entry.path for entry in it if entry.name.endswith(".txt") and entry.name not in keep]
+    except OSError:
+        return
+    for path in stale:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
 
 def extract_text(filepath: str) -> str:
     """Extract text from file based on extension"""
     ext = os.path.splitext(filepath)[1].lower()
     if ext == '.pdf':
-        return extract_text_from_pdf(filepath)
+        extractor = extract_text_from_pdf
     elif ext in ['.docx', '.doc']:
-        return extract_text_from_docx(filepath)
+        extractor = extract_text_from_docx
     elif ext == '.txt':
-        return extract_text_from_txt(filepath)
+        extractor = extract_text_from_txt
     else:
         return f"[Unsupported file type: {ext}]"
+    
+    try:
+        if extractor is extract_text_from_txt:
+            return extractor(filepath)
+        
+        # PDF/DOCX parsing is slow, so reuse text extracted earlier
+        text = read_cached_text(filepath)
+        if text is not None:
+            return text
+        
+        # Stat before extracting: a re-upload landing mid-extraction then leaves
+        # the cache keyed to the old version and the next read misses
+        st = os.stat(filepath)
+        text = extractor(filepath)
+    except ExtractionError as e:
+        return str(e)
+    except OSError as e:
+        return f"[Error reading file: {e}]"
+    
+    write_cached_text(filepath, text, st)
+    return text
+
+def extract_texts(filepaths: list) -> list:
+    """Extract all of the user's documents, using cached text where fresh and a thread pool for the rest"""
+    # filepaths is the whole document folder, so anything else cached was deleted
+    prune_cached_texts(filepaths)
+    texts = [read_cached_text(filepath) for filepath in filepaths]
+    missing = [i for i, text in enumerate(texts) if text is None]
+    
+    # Only DOCX extraction (and plain TXT reads) actually runs in parallel here:
+    # PDFs share the pool but extract_text_from_pdf takes _FITZ_LOCK, so they
+    # still go one at a time
+    with ThreadPoolExecutor(max_workers=min(8, max(len(missing), 1))) as executor:
+        for i, text in zip(missing, executor.map(extract_text, [filepaths[i] for i in missing])):
+            texts[i] = text
+    return texts
 
 def simple_search(text: str, query: str) -> list:
     """Simple keyword search - returns matching sentences/paragraphs"""
     query_words = query.lower().split()
+    if not query_words:
+        return []
     
-    # Split text into paragraphs
-    paragraphs = text.split('\n')
+    # One alternation matches any query word in a single pass
+    pattern = re.compile("|".join(map(re.escape, query_words)))
+    
+    # Split text into paragraphs, lowercasing the whole document once
+    paragraphs = zip(text.split('\n'), text.lower().split('\n'))
     matches = []
     
-    for para in paragraphs:
+    for para, para_lower in paragraphs:
         para = para.strip()
         if not para or len(para) < 10:
             continue
         
-        para_lower = para.lower()
         # Check if any query word is in paragraph
-        if any(word in para_lower for word in query_words):
+        if pattern.search(para_lower):
             matches.append(para)
     
     return matches
 
 
 @mcp.tool()
-def search_documents(query: str, max_results: int = 10) -> str:
+async def search_documents(query: str, max_results: int = 10) -> str:
     """
     Search for text across all your documents using keyword matching.
     
@@ -131,11 +252,13 @@ def search_documents(query: str, max_results: int = 10) -> str:
     if not files:
         return "No documents uploaded. Upload via admin panel."
     
+    # Extraction blocks on disk and parsers, so keep it off the event loop
+    filepaths = [os.path.join(docs_dir, filename) for filename in files]
+    texts = await asyncio.to_thread(extract_texts, filepaths)
+    
     all_matches = []
     
-    for filename in files:
-        filepath = os.path.join(docs_dir, filename)
-        text = extract_text(filepath)
+    for filename, text in zip(files, texts):
         matches = simple_search(text, query)
         
         for match in matches[:3]:  # Max 3 per file
@@ -147,13 +270,13 @@ def search_documents(query: str, max_results: int = 10) -> str:
     if not all_matches:
         return f"No results found for: {query}"
     
-    output = f"🔍 Found {min(len(all_matches), max_results)} results for '{query}':\n\n"
+    parts = [f"🔍 Found {min(len(all_matches), max_results)} results for '{query}':\n\n"]
     
     for i, m in enumerate(all_matches[:max_results], 1):
-        output += f"**{i}. From: {m['source']}**\n"
-        output += f"{m['text']}\n\n"
+        parts.append(f"**{i}. From: {m['source']}**\n")
+        parts.append(f"{m['text']}\n\n")
     
-    return output
+    return "".join(parts)
 
 
 @mcp.tool()
@@ -171,22 +294,22 @@ def list_documents() -> str:
     if not os.path.exists(docs_dir):
         return "No documents uploaded yet."
     
-    files = os.listdir(docs_dir)
-    if not files:
+    # scandir reuses the directory read's stat data where the OS provides it
+    with os.scandir(docs_dir) as it:
+        entries = [(entry.name, entry.stat().st_size) for entry in it if entry.is_file()]
+    if not entries:
         return "No documents uploaded. Upload via admin panel."
     
-    output = "📚 Your Documents:\n\n"
-    for filename in files:
-        filepath = os.path.join(docs_dir, filename)
-        size = os.path.getsize(filepath)
+    parts = ["📚 Your Documents:\n\n"]
+    for filename, size in entries:
         size_str = f"{size / 1024:.1f} KB" if size > 1024 else f"{size} bytes"
-        output += f"• **{filename}** ({size_str})\n"
+        parts.append(f"• **{filename}** ({size_str})\n")
     
-    return output
+    return "".join(parts)
 
 
 @mcp.tool()
-def read_document(filename: str, max_chars: int = 5000) -> str:
+async def read_document(filename: str, max_chars: int = 5000) -> str:
     """
     Read the content of a specific document.
     
@@ -205,7 +328,7 @@ def read_document(filename: str, max_chars: int = 5000) -> str:
     if not os.path.exists(filepath):
         return f"Document '{filename}' not found."
     
-    text = extract_text(filepath)
+    text = await asyncio.to_thread(extract_text, filepath)
     
     if len(text) > max_chars:
         text = text[:max_chars] + f"\n\n... [Truncated, {len(text)} total characters]"
@@ -2,15 +2,59 @@
 RSS MCP Server - Per-user RSS feeds
 Reads feeds from users.json based on --user argument
 """
+import asyncio
+import functools
 import json
 import os
+import re
 import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from io import BytesIO
 from fastmcp import FastMCP
-import feedparser
+import httpx
 from typing import Optional
 
+# Prefer orjson for faster config parsing
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+# Shared HTTP client, opened for the lifetime of the server
+_http_client: Optional[httpx.AsyncClient] = None
+
+# Parsed articles per feed URL: url -> (fetched_at, etag, last_modified, articles)
+_FEED_CACHE: dict = {}
+FEED_TTL = 300  # Seconds before a cached feed is revalidated
+
+# Parsing allocates heavily, so only a few feeds are parsed at once;
+# downloads stay unbounded and bodies past SPOOL_SIZE bytes spill to disk
+PARSE_WORKERS = 4
+SPOOL_SIZE = 512 * 1024
+_parse_slots = asyncio.Semaphore(PARSE_WORKERS)
+
+
+@asynccontextmanager
+async def lifespan(server):
+    """Keep one HTTP client open so feed fetches reuse connections"""
+    global _http_client
+    async with httpx.AsyncClient(timeout=30, follow_redirects=True) as client:
+        _http_client = client
+        try:
+            yield
+        finally:
+            _http_client = None
+
+
 # Initialize FastMCP server
-mcp = FastMCP("RSS News Server")
+mcp = FastMCP("RSS News Server", lifespan=lifespan)
 
 # Get user ID from arguments
 USER_ID = None
@@ -22,17 +66,24 @@ for i, arg in enumerate(sys.argv):
 # Config path
 USERS_PATH = os.path.join(os.path.dirname(__file__), "admin-backend", "users.json")
 
+@functools.lru_cache(maxsize=1)
+def _read_user_feeds(mtime: float) -> tuple:
+    """Read this user's feeds; cached until users.json's mtime changes"""
+    with open(USERS_PATH, 'rb') as f:
+        data = json_loads(f.read())
+    for user in data.get('users', []):
+        if user.get('id') == USER_ID:
+            return tuple(user.get('feeds', []))
+    return ()
+
+
 def load_feeds():
     """Load feeds for specific user from users.json"""
     try:
         if os.path.exists(USERS_PATH) and USER_ID:
-            with open(USERS_PATH, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                for user in data.get('users', []):
-                    if user.get('id') == USER_ID:
-                        feeds = user.get('feeds', [])
-                        if feeds:
-                            return feeds
+            feeds = _read_user_feeds(os.path.getmtime(USERS_PATH))
+            if feeds:
+                return list(feeds)
     except Exception as e:
         print(f"Error loading feeds: {e}", file=sys.stderr)
     
@@ -40,106 +91,236 @@ def load_feeds():
     return []
 
 
-def fetch_feed_articles(url: str, limit: int = 10) -> list:
-    """Fetch articles from a single feed"""
+# XML namespaces used by Atom, RSS 1.0 and Dublin Core dates
+ATOM_NS = '{http://www.w3.org/2005/Atom}'
+RSS1_NS = '{http://purl.org/rss/1.0/}'
+DC_NS = '{http://purl.org/dc/elements/1.1/}'
+_ITEM_TAGS = {'item', ATOM_NS + 'entry', RSS1_NS + 'item'}
+
+# Most articles any tool returns per feed; parsing stops once this many are read
+MAX_ARTICLES = 20
+
+# Immutable, so cached articles can be handed to every caller without copying
+Article = namedtuple("Article", "title link published")
+
+
+def fast_parse(body, max_items: int = MAX_ARTICLES) -> list:
+    """Stream title/link/date out of RSS or Atom XML without feedparser"""
+    if isinstance(body, bytes):
+        body = BytesIO(body)
+    articles = []
+    for _, elem in ET.iterparse(body, events=('end',)):
+        if elem.tag not in _ITEM_TAGS:
+            continue
+        
+        if elem.tag == ATOM_NS + 'entry':
+            # type="xhtml" titles wrap their text in a <div>, so join all of it
+            title_elem = elem.find(ATOM_NS + 'title')
+            title = '' if title_elem is None else ''.join(title_elem.itertext())
+            link = ''
+            for link_elem in elem.findall(ATOM_NS + 'link'):
+                if link_elem.get('rel', 'alternate') == 'alternate':
+                    link = link_elem.get('href', '')
+                    break
+            published = elem.findtext(ATOM_NS + 'published') or elem.findtext(ATOM_NS + 'updated')
+        else:
+            ns = RSS1_NS if elem.tag.startswith(RSS1_NS) else ''
+            title = elem.findtext(ns + 'title')
+            link = elem.findtext(ns + 'link')
+            published = elem.findtext('pubDate') or elem.findtext(DC_NS + 'date')
+        
+        articles.append(Article(
+            (title or '').strip() or 'No title',
+            (link or '').strip(),
+            (published or '').strip() or 'Unknown date'
+        ))
+        # Free the parsed item as we go
+        elem.clear()
+        if len(articles) >= max_items:
+            break
+    return articles
+
+
+def _parse_articles(body, max_items: int = MAX_ARTICLES) -> list:
+    """Parse a feed body (bytes or a binary file) into Article tuples"""
+    try:
+        articles = fast_parse(body, max_items)
+        if articles:
+            return articles
+    except (ET.ParseError, ValueError):
+        # expat raises ValueError for multi-byte encodings such as GB2312, GBK and Big5
+        pass
+    
+    # Malformed or unusual feeds fall back to the lenient feedparser
+    import feedparser
+    if not isinstance(body, bytes):
+        body.seek(0)
+    feed = feedparser.parse(body)
+    articles = []
+    for entry in feed.entries[:max_items]:
+        articles.append(Article(
+            entry.get('title', 'No title'),
+            entry.get('link', ''),
+            entry.get('published', 'Unknown date')
+        ))
+    return articles
+
+
+# Sort key for articles without a usable date, so they sort last
+_NO_DATE = datetime.min.replace(tzinfo=timezone.utc)
+
+
+def _parse_date(value: str) -> Optional[datetime]:
+    """Parse an RSS (RFC 822) or Atom (ISO 8601) date; None if unparseable"""
+    try:
+        # Handles named zones like GMT, EST and PDT without a tz database
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        try:
+            date = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return date
+
+
+async def _fetch_one(client: httpx.AsyncClient, url: str, limit: int) -> list:
+    """Download a feed and parse its body, skipping both when it is unchanged"""
     try:
-        feed = feedparser.parse(url)
-        articles = []
-        for entry in feed.entries[:limit]:
-            articles.append({
-                'title': entry.get('title', 'No title'),
-                'link': entry.get('link', ''),
-                'published': entry.get('published', 'Unknown date')
-            })
-        return articles
+        cached = _FEED_CACHE.get(url)
+        headers = {}
+        if cached:
+            fetched_at, etag, modified, articles = cached
+            if time.monotonic() - fetched_at < FEED_TTL:
+                return articles[:limit]
+            if etag:
+                headers['If-None-Match'] = etag
+            if modified:
+                headers['If-Modified-Since'] = modified
+        
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE) as body:
+            async with client.stream('GET', url, headers=headers) as response:
+                not_modified = response.status_code == 304 and cached is not None
+                if not not_modified:
+                    response.raise_for_status()
+                    async for chunk in response.aiter_bytes():
+                        body.write(chunk)
+                    etag = response.headers.get('ETag')
+                    modified = response.headers.get('Last-Modified')
+            
+            if not_modified:
+                etag, modified, articles = cached[1:]
+            else:
+                body.seek(0)
+                # Parsing is CPU-bound, so keep it off the event loop
+                async with _parse_slots:
+                    articles = await asyncio.to_thread(_parse_articles, body)
+        _FEED_CACHE[url] = (time.monotonic(), etag, modified, articles)
+        
+        return articles[:limit]
     except Exception as e:
         return []
 
 
-# Create tools for each feed dynamically
-feeds = load_feeds()
+async def _gather_feeds(urls: list, limit: int) -> list:
+    """Fetch several feeds concurrently, returning one article list per URL"""
+    # A feed listed more than once is only fetched once
+    unique = list(dict.fromkeys(urls))
+    if _http_client is not None:
+        results = await asyncio.gather(*[_fetch_one(_http_client, url, limit) for url in unique])
+    else:
+        async with httpx.AsyncClient(timeout=30, follow_redirects=True) as client:
+            results = await asyncio.gather(*[_fetch_one(client, url, limit) for url in unique])
+    
+    fetched = dict(zip(unique, results))
+    return [fetched[url] for url in urls]
+
+
+async def fetch_feed_articles(url: str, limit: int = 10) -> list:
+    """Fetch articles from a single feed"""
+    return (await _gather_feeds([url], limit))[0]
+
+
+# Characters dropped from feed names (keeps Unicode letters, digits and '_')
+_SAFE_RE = re.compile(r'\W')
+
+
+def _safe_name(title: str) -> str:
+    """Normalize a feed title for name lookups"""
+    return _SAFE_RE.sub('', title.lower().replace(' ', '_').replace('-', '_'))
 
-for feed_config in feeds:
-    feed_title = feed_config.get('title', 'Unknown')
-    feed_url = feed_config.get('url', '')
-    feed_category = feed_config.get('category', 'News')
+
+@mcp.tool()
+async def rss_feed(name: str, limit: int = 10) -> str:
+    """
+    Get latest news from one of your configured RSS feeds.
     
-    if not feed_url:
-        continue
+    Args:
+        name: Feed name as listed by rss_list_sources
+        limit: Maximum number of articles (default 10, max 20)
     
-    # Create safe function name from title
-    safe_name = feed_title.lower().replace(' ', '_').replace('-', '_')
-    safe_name = ''.join(c for c in safe_name if c.isalnum() or c == '_')
-    tool_name = f"feed_{safe_name}"
+    Returns:
+        Latest articles from that feed
+    """
+    wanted = _safe_name(name)
+    feed_config = next((f for f in load_feeds() if _safe_name(f.get('title', '')) == wanted), None)
     
-    # Create the tool function
-    def create_feed_tool(title, url, category):
-        def feed_tool(limit: int = 10) -> str:
-            f"""
-            Get latest news from {title}.
-            Category: {category}
-            
-            Args:
-                limit: Maximum number of articles (default 10, max 20)
-            
-            Returns:
-                Latest articles from {title}
-            """
-            limit = min(max(limit, 1), 20)
-            articles = fetch_feed_articles(url, limit)
-            
-            if not articles:
-                return f"Could not fetch articles from {title}"
-            
-            result = f"📰 {title} ({len(articles)} articles):\n\n"
-            for i, article in enumerate(articles, 1):
-                result += f"{i}. **{article['title']}**\n"
-                result += f"   {article['link']}\n\n"
-            
-            return result
-        
-        feed_tool.__name__ = f"feed_{title.lower().replace(' ', '_')}"
-        feed_tool.__doc__ = f"Get latest news from {title}. Category: {category}"
-        return feed_tool
+    if not feed_config or not feed_config.get('url'):
+        return f"Feed '{name}' not found. Use rss_list_sources to see your feeds."
+    
+    title = feed_config.get('title', 'Unknown')
+    limit = min(max(limit, 1), MAX_ARTICLES)
+    articles = await fetch_feed_articles(feed_config['url'], limit)
     
-    # Register the tool
-    tool_func = create_feed_tool(feed_title, feed_url, feed_category)
-    mcp.tool(name=tool_name, description=f"Get news from {feed_title} ({feed_category})")(tool_func)
+    if not articles:
+        return f"Could not fetch articles from {title}"
+    
+    parts = [f"📰 {title} ({len(articles)} articles):\n\n"]
+    for i, article in enumerate(articles, 1):
+        parts.append(f"{i}. **{article.title}**\n")
+        parts.append(f"   {article.link}\n\n")
+    
+    return "".join(parts)
 
 
 @mcp.tool()
-def rss_all_feeds(limit: int = 5) -> str:
+async def rss_all_feeds(limit: int = 5) -> str:
     """
     Get latest news from ALL your configured RSS feeds.
     
     Args:
-        limit: Number of articles per feed (default 5)
+        limit: Number of articles per feed (default 5, max 20)
     
     Returns:
         Latest articles from all your feeds
     """
+    limit = min(max(limit, 1), MAX_ARTICLES)
     feeds = load_feeds()
     
     if not feeds:
         return "No RSS feeds configured. Add feeds via admin panel."
     
     all_articles = []
+    results = await _gather_feeds([f['url'] for f in feeds], limit)
     
-    for feed_config in feeds:
-        articles = fetch_feed_articles(feed_config['url'], limit)
+    # (source, article) pairs
+    for feed_config, articles in zip(feeds, results):
         for article in articles:
-            article['source'] = feed_config['title']
-            all_articles.append(article)
+            all_articles.append((feed_config['title'], article))
     
     if not all_articles:
         return "No articles found from any feed."
     
-    result = f"📰 All Feeds ({len(all_articles)} articles):\n\n"
-    for i, article in enumerate(all_articles[:limit*len(feeds)], 1):
-        result += f"{i}. [{article['source']}] **{article['title']}**\n"
-        result += f"   {article['link']}\n\n"
+    # Newest first across all feeds
+    all_articles.sort(key=lambda pair: _parse_date(pair[1].published) or _NO_DATE, reverse=True)
+    
+    parts = [f"📰 All Feeds ({len(all_articles)} articles):\n\n"]
+    for i, (source, article) in enumerate(all_articles[:limit*len(feeds)], 1):
+        parts.append(f"{i}. [{source}] **{article.title}**\n")
+        parts.append(f"   {article.link}\n\n")
     
-    return result
+    return "".join(parts)
 
 
 @mcp.tool()
@@ -155,11 +336,11 @@ def rss_list_sources() -> str:
     if not feeds:
         return "No RSS feeds configured. Add feeds via admin panel."
     
-    result = "📋 Your RSS Sources:\n\n"
+    parts = ["📋 Your RSS Sources:\n\n"]
     for feed in feeds:
-        result += f"• **{feed['title']}** ({feed.get('category', 'General')})\n"
+        parts.append(f"• **{feed['title']}** ({feed.get('category', 'General')})\n")
     
-    return result
+    return "".join(parts)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,33 @@
+import importlib.util
+import os
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_rss_server():
+    spec = importlib.util.spec_from_file_location("rss_server", os.path.join(ROOT, "rss-server.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+rss = load_rss_server()
+
+
+class ParseArticlesTest(unittest.TestCase):
+    def test_gb2312_feed_falls_back_to_feedparser(self):
+        body = (
+            '<?xml version="1.0" encoding="gb2312"?>'
+            '<rss version="2.0"><channel><title>新闻</title>'
+            '<item><title>今日要闻</title><link>http://example.com/1</link></item>'
+            '</channel></rss>'
+        ).encode("gb2312")
+        articles = rss._parse_articles(body)
+        self.assertEqual(len(articles), 1)
+        self.assertEqual(articles[0].title, "今日要闻")
+        self.assertEqual(articles[0].link, "http://example.com/1")
+
+
+if __name__ == "__main__":
+    unittest.main()
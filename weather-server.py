@@ -2,81 +2,201 @@
 Weather MCP Server - Provides weather information for Xiaozhi
 Uses Open-Meteo free API (no API key required)
 """
+import asyncio
 import json
 import os
+import sys
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from fastmcp import FastMCP
-import urllib.request
-import urllib.parse
+import httpx
 from typing import Optional
 
+# Prefer orjson for faster response parsing
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+# HTTP/2 lets concurrent lookups share one connection per host; httpx needs h2 for it
+try:
+    import h2  # noqa: F401
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+# Shared HTTP client, opened for the lifetime of the server
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _new_client() -> httpx.AsyncClient:
+    """Create an HTTP client that keeps connections alive (gzip is on by default)"""
+    return httpx.AsyncClient(
+        http2=HTTP2,
+        timeout=httpx.Timeout(10.0, connect=3.0),
+        limits=httpx.Limits(keepalive_expiry=60),
+    )
+
+
+@asynccontextmanager
+async def lifespan(server):
+    """Keep one HTTP client open so repeat calls reuse HTTPS connections"""
+    global _client
+    async with _new_client() as client:
+        _client = client
+        try:
+            yield
+        finally:
+            _client = None
+
+
 # Initialize FastMCP server
-mcp = FastMCP("Weather Server")
+mcp = FastMCP("Weather Server", lifespan=lifespan)
+
+# City name -> (lat, lon, name), or None if not found; coordinates never change
+GEO_CACHE_SIZE = 512
+_GEO_CACHE: OrderedDict = OrderedDict()
+
+# Forecasts change at most every few minutes: (lat, lon, fields) -> (fetched_at, data)
+WEATHER_TTL = 600
+_WEATHER_CACHE: dict = {}
+
+# Forecast query parameters for each level of detail
+FORECAST_FIELDS = {
+    "full": {
+        "current": "temperature_2m,relative_humidity_2m,weather_code,wind_speed_10m",
+        "daily": "weather_code,temperature_2m_max,temperature_2m_min,precipitation_probability_max",
+        "forecast_days": 3,
+    },
+    "temp_only": {
+        "current": "temperature_2m",
+        "forecast_days": 1,
+    },
+}
 
 
-def get_coordinates(city: str) -> tuple:
+async def _get_json(url: str, params: dict) -> dict:
+    """GET an Open-Meteo endpoint and return the decoded JSON body"""
+    if _client is not None:
+        response = await _client.get(url, params=params)
+    else:
+        async with _new_client() as client:
+            response = await client.get(url, params=params)
+    response.raise_for_status()
+    return json_loads(response.content)
+
+
+async def get_coordinates(city: str) -> tuple:
     """Get latitude and longitude for a city using Open-Meteo geocoding"""
-    try:
-        url = f"https://geocoding-api.open-meteo.com/v1/search?name={urllib.parse.quote(city)}&count=1"
-        with urllib.request.urlopen(url, timeout=10) as response:
-            data = json.loads(response.read().decode())
-            if data.get('results'):
-                result = data['results'][0]
-                return result['latitude'], result['longitude'], result.get('name', city)
-    except Exception as e:
-        print(f"Geocoding error: {e}")
+    key = city.strip().lower()
+    if key in _GEO_CACHE:
+        _GEO_CACHE.move_to_end(key)
+        found = _GEO_CACHE[key]
+    else:
+        try:
+            data = await _get_json(
+                "https://geocoding-api.open-meteo.com/v1/search",
+                {"name": key, "count": 1},
+            )
+        except Exception as e:
+            # Errors are not cached so the next call retries
+            print(f"Geocoding error: {e}", file=sys.stderr)
+            return None, None, city
+        found = None
+        if data.get('results'):
+            result = data['results'][0]
+            found = (result['latitude'], result['longitude'], result.get('name'))
+        _GEO_CACHE[key] = found
+        if len(_GEO_CACHE) > GEO_CACHE_SIZE:
+            _GEO_CACHE.popitem(last=False)
+    
+    if found:
+        lat, lon, name = found
+        return lat, lon, name or city
     return None, None, city
 
 
-def get_weather_data(lat: float, lon: float) -> dict:
-    """Get weather data from Open-Meteo API"""
+async def get_weather_data(lat: float, lon: float, *, fields: str = "full") -> dict:
+    """Get weather data from Open-Meteo API ("full" forecast or "temp_only")"""
+    key = (lat, lon, fields)
+    # A fresh full forecast also answers a temperature-only request
+    for cache_key in (key, (lat, lon, "full")):
+        cached = _WEATHER_CACHE.get(cache_key)
+        if cached and time.monotonic() - cached[0] < WEATHER_TTL:
+            return cached[1]
+    
     try:
-        url = (
-            f"https://api.open-meteo.com/v1/forecast?"
-            f"latitude={lat}&longitude={lon}"
-            f"&current=temperature_2m,relative_humidity_2m,weather_code,wind_speed_10m"
-            f"&daily=weather_code,temperature_2m_max,temperature_2m_min,precipitation_probability_max"
-            f"&timezone=auto&forecast_days=3"
+        data = await _get_json(
+            "https://api.open-meteo.com/v1/forecast",
+            {"latitude": lat, "longitude": lon, "timezone": "auto", **FORECAST_FIELDS[fields]},
         )
-        with urllib.request.urlopen(url, timeout=10) as response:
-            return json.loads(response.read().decode())
+        now = time.monotonic()
+        # Drop expired entries so the cache only holds recent locations
+        for stale in [k for k, (ts, _) in _WEATHER_CACHE.items() if now - ts >= WEATHER_TTL]:
+            del _WEATHER_CACHE[stale]
+        _WEATHER_CACHE[key] = (now, data)
+        return data
     except Exception as e:
-        print(f"Weather API error: {e}")
+        print(f"Weather API error: {e}", file=sys.stderr)
     return None
 
 
+async def get_weather_batch(cities: list, *, fields: str = "full") -> list:
+    """
+    Geocode all cities, then fetch all their forecasts, each phase concurrently.
+    
+    Returns:
+        (lat, lon, resolved_city, weather) per city; lat and weather are None
+        when the city or its forecast could not be found
+    """
+    coords = await asyncio.gather(*[get_coordinates(city) for city in cities])
+    found = [i for i, (lat, _, _) in enumerate(coords) if lat is not None]
+    fetched = await asyncio.gather(*[get_weather_data(*coords[i][:2], fields=fields) for i in found])
+    
+    weathers = [None] * len(cities)
+    for i, weather in zip(found, fetched):
+        weathers[i] = weather
+    return [(*coord, weather) for coord, weather in zip(coords, weathers)]
+
+
+# WMO weather code descriptions
+_WEATHER_CODES = {
+    0: "☀️ Clear sky",
+    1: "🌤️ Mainly clear",
+    2: "⛅ Partly cloudy",
+    3: "☁️ Overcast",
+    45: "🌫️ Foggy",
+    48: "🌫️ Depositing rime fog",
+    51: "🌧️ Light drizzle",
+    53: "🌧️ Moderate drizzle",
+    55: "🌧️ Dense drizzle",
+    61: "🌧️ Slight rain",
+    63: "🌧️ Moderate rain",
+    65: "🌧️ Heavy rain",
+    71: "🌨️ Slight snow",
+    73: "🌨️ Moderate snow",
+    75: "❄️ Heavy snow",
+    77: "🌨️ Snow grains",
+    80: "🌦️ Slight rain showers",
+    81: "🌦️ Moderate rain showers",
+    82: "⛈️ Violent rain showers",
+    85: "🌨️ Slight snow showers",
+    86: "🌨️ Heavy snow showers",
+    95: "⛈️ Thunderstorm",
+    96: "⛈️ Thunderstorm with hail",
+    99: "⛈️ Thunderstorm with heavy hail"
+}
+
+
 def weather_code_to_description(code: int) -> str:
     """Convert WMO weather code to description"""
-    codes = {
-        0: "☀️ Clear sky",
-        1: "🌤️ Mainly clear",
-        2: "⛅ Partly cloudy",
-        3: "☁️ Overcast",
-        45: "🌫️ Foggy",
-        48: "🌫️ Depositing rime fog",
-        51: "🌧️ Light drizzle",
-        53: "🌧️ Moderate drizzle",
-        55: "🌧️ Dense drizzle",
-        61: "🌧️ Slight rain",
-        63: "🌧️ Moderate rain",
-        65: "🌧️ Heavy rain",
-        71: "🌨️ Slight snow",
-        73: "🌨️ Moderate snow",
-        75: "❄️ Heavy snow",
-        77: "🌨️ Snow grains",
-        80: "🌦️ Slight rain showers",
-        81: "🌦️ Moderate rain showers",
-        82: "⛈️ Violent rain showers",
-        85: "🌨️ Slight snow showers",
-        86: "🌨️ Heavy snow showers",
-        95: "⛈️ Thunderstorm",
-        96: "⛈️ Thunderstorm with hail",
-        99: "⛈️ Thunderstorm with heavy hail"
-    }
-    return codes.get(code, f"Weather code {code}")
+    return _WEATHER_CODES.get(code, f"Weather code {code}")
 
 
 @mcp.tool()
-def get_weather(city: str = "Jakarta") -> str:
+async def get_weather(city: str = "Jakarta") -> str:
     """
     Get current weather and 3-day forecast for a city.
     
@@ -86,13 +206,11 @@ def get_weather(city: str = "Jakarta") -> str:
     Returns:
         Current weather conditions and forecast
     """
-    lat, lon, resolved_city = get_coordinates(city)
+    lat, lon, resolved_city, weather = (await get_weather_batch([city]))[0]
     
     if lat is None:
         return f"Could not find location: {city}. Please try a different city name."
     
-    weather = get_weather_data(lat, lon)
-    
     if not weather:
         return f"Could not fetch weather data for {resolved_city}"
     
@@ -104,14 +222,14 @@ def get_weather(city: str = "Jakarta") -> str:
     wind = current.get('wind_speed_10m', 'N/A')
     weather_code = current.get('weather_code', 0)
     
-    result = f"🌍 **Weather for {resolved_city}**\n\n"
-    result += f"**Current Conditions:**\n"
-    result += f"• {weather_code_to_description(weather_code)}\n"
-    result += f"• Temperature: {temp}°C\n"
-    result += f"• Humidity: {humidity}%\n"
-    result += f"• Wind: {wind} km/h\n\n"
+    parts = [f"🌍 **Weather for {resolved_city}**\n\n"]
+    parts.append(f"**Current Conditions:**\n")
+    parts.append(f"• {weather_code_to_description(weather_code)}\n")
+    parts.append(f"• Temperature: {temp}°C\n")
+    parts.append(f"• Humidity: {humidity}%\n")
+    parts.append(f"• Wind: {wind} km/h\n\n")
     
-    result += f"**3-Day Forecast:**\n"
+    parts.append(f"**3-Day Forecast:**\n")
     dates = daily.get('time', [])[:3]
     max_temps = daily.get('temperature_2m_max', [])[:3]
     min_temps = daily.get('temperature_2m_min', [])[:3]
@@ -119,18 +237,18 @@ def get_weather(city: str = "Jakarta") -> str:
     rain_probs = daily.get('precipitation_probability_max', [])[:3]
     
     for i, date in enumerate(dates):
-        result += f"• **{date}**: {weather_code_to_description(codes[i] if i < len(codes) else 0)}\n"
-        result += f"  High: {max_temps[i] if i < len(max_temps) else 'N/A'}°C, "
-        result += f"Low: {min_temps[i] if i < len(min_temps) else 'N/A'}°C"
+        parts.append(f"• **{date}**: {weather_code_to_description(codes[i] if i < len(codes) else 0)}\n")
+        parts.append(f"  High: {max_temps[i] if i < len(max_temps) else 'N/A'}°C, ")
+        parts.append(f"Low: {min_temps[i] if i < len(min_temps) else 'N/A'}°C")
         if i < len(rain_probs):
-            result += f", Rain: {rain_probs[i]}%"
-        result += "\n"
+            parts.append(f", Rain: {rain_probs[i]}%")
+        parts.append("\n")
     
-    return result
+    return "".join(parts)
 
 
 @mcp.tool()
-def get_temperature(city: str = "Jakarta") -> str:
+async def get_temperature(city: str = "Jakarta") -> str:
     """
     Get just the current temperature for a city.
     
@@ -140,13 +258,11 @@ def get_temperature(city: str = "Jakarta") -> str:
     Returns:
         Current temperature
     """
-    lat, lon, resolved_city = get_coordinates(city)
+    lat, lon, resolved_city, weather = (await get_weather_batch([city], fields="temp_only"))[0]
     
     if lat is None:
         return f"Could not find: {city}"
     
-    weather = get_weather_data(lat, lon)
-    
     if not weather:
         return f"Could not get temperature for {resolved_city}"
     